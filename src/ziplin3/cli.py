@@ -1,26 +1,75 @@
 #!/usr/bin/env python3
 
 import argparse
+from functools import lru_cache
 from pathlib import Path
-from client import client
+from client import client, watch_terminal_size
 
 
 __root__ = Path(__file__).parent
 
-def interface (args: argparse.Namespace) -> None:
+@lru_cache(maxsize=1)
+def banner () -> str:
+
+    '''
+    Returns the banner, read from disk once.
+    '''
+
+    return __root__.joinpath('banner').read_text()
+
+@lru_cache(maxsize=1)
+def build_parser () -> argparse.ArgumentParser:
+
+    '''
+    Builds the argument parser once, repeated calls 
+    e.g. from scheduled invocations reuse it.
+    '''
+
+    # ---- define argparser ----
+    parser = argparse.ArgumentParser(
+                    prog='ziplin3',
+                    description='A modular tool for local and remote backup management via ssh.',
+                    epilog='For convenient and simple backuping!')
+    # route details
+    parser.add_argument('-o', '--origin', help="Origin path of the directory of archive which should be backuped.", default='./')
+    parser.add_argument('-t', '--target', help="Target path of the directory on local or remote host e.g. '/home/linuxUser/.backups/'")
+    # ssh credentials
+    parser.add_argument('--host', help="Target host name, or IPv4 address. If not set the host will by default be the local machine i.e. 'localhost'.")
+    parser.add_argument('-u', '--user', help="The user on target host. Only needed if --host is set.")
+    parser.add_argument('--pwd', help="Provide SSH password. If none provided will by default use the public key in .ssh file. Only needed if --host is set.")
+    parser.add_argument('-k', '--key', help="Provide path to SSH public-key file. Only needed if --host is set.")
+    parser.add_argument('-p', '--port', type=int, help="SSH port on target host. Only needed if --host is set.")
+    parser.add_argument('--ssh_compression', action='store_true', help="Enable ssh transport compression. Only needed if --host is set.")
+    # backup options
+    parser.add_argument('-c', action='store_true', help="Enable compression.")
+    parser.add_argument('--compression_format', help="Compression format e.g. zip, zstd or tar. Only needed if compression is enabled.", default='zip')
+    parser.add_argument('-a', action='store_true', help="Will delete all artifact files during backup.")
+    parser.add_argument('-f', action='store_true', help="Forces a copy of every file, regardless of redundance.")
+    parser.add_argument('--checksum', action='store_true', help="Compare checksums of files even if size and modification time match.")
+    parser.add_argument('-w', '--workers', type=int, help="Number of files transferred in parallel. Remote backups use at most 7, as each worker opens an ssh session and OpenSSH accepts 10 per connection (MaxSessions).", default=8)
+    parser.add_argument('--batch_small', action='store_true', help="Send files below 64 KiB to the remote host in a single tar stream.")
+    parser.add_argument('-l', '--log', help='Optional path to logging file.')
+
+    return parser
+
+def interface (args: argparse.Namespace) -> bool:
+
+    '''
+    Runs the backup described by args, returns True on success.
+    '''
 
     zl = client()
 
     if not args.target:
         print('No target path provided! Use the flag --target to provide a target path or see the help menu -h.')
-        return
+        return False
 
     # if host is provided, enable ssh
     if args.host:
 
         if not args.user:
             print('No user provided! Use the flag --user to provide a user name or see the help menu -h.')
-            return
+            return False
         
         # ssh credentials
         key_file = None
@@ -33,7 +82,7 @@ def interface (args: argparse.Namespace) -> None:
         if args.port:
             port = args.port
             
-        zl.ssh(args.user, args.host, password, key_file, port)
+        zl.ssh(args.user, args.host, password, key_file, port, compression=args.ssh_compression)
     
     # logging
     logging = None
@@ -41,39 +90,20 @@ def interface (args: argparse.Namespace) -> None:
         logging = args.log
 
     # start backup    
-    zl.backup(args.origin, args.target, args.c, args.compression_format, args.a, args.f, log_path=logging)
+    return zl.backup(args.origin, args.target, args.c, args.compression_format, args.a, args.f, log_path=logging, checksum=args.checksum, workers=args.workers, batch_small=args.batch_small)
 
 
 
 if __name__ == '__main__':
 
     # display banner
-    with open(__root__.joinpath('banner')) as f:
-        print(f.read())
-
-    # ---- define argparser ----
-    parser = argparse.ArgumentParser(
-                    prog='ziplin3',
-                    description='A modular tool for local and remote backup management via ssh.',
-                    epilog='For convenient and simple backuping!')
-    # route details
-    parser.add_argument('-o', '--origin', help="Origin path of the directory of archive which should be backuped.", default='./')
-    parser.add_argument('-t', '--target', help="Target path of the directory on local or remote host e.g. '/home/linuxUser/.backups/'")
-    # ssh credentials
-    parser.add_argument('--host', help="Target host name, or IPv4 address. If not set the host will by default be the local machine i.e. 'localhost'.")
-    parser.add_argument('-u', '--user', help="The user on target host. Only needed if --host is set.")
-    parser.add_argument('--pwd', help="Provide SSH password. If none provided will by default use the public key in .ssh file. Only needed if --host is set.")
-    parser.add_argument('-k', '--key', help="Provide path to SSH public-key file. Only needed if --host is set.")
-    parser.add_argument('-p', '--port', help="SSH port on target host. Only needed if --host is set.")
-    # backup options
-    parser.add_argument('-c', action='store_true', help="Enable compression.")
-    parser.add_argument('--compression_format', help="Enable compression. Only needed if compression is enabled.", default='zip')
-    parser.add_argument('-a', action='store_true', help="Will delete all artifact files during backup.")
-    parser.add_argument('-f', action='store_true', help="Forces a copy of every file, regardless of redundance.")
-    parser.add_argument('-l', '--log', help='Optional path to logging file.')
+    print(banner())
 
+    args = build_parser().parse_args()
 
-    args = parser.parse_args()
+    # keep the progress output fit to the terminal on resize
+    watch_terminal_size()
 
     # ---- forward to interface ----
-    interface(args=args)
\ No newline at end of file
+    # the exit status is non-zero if the backup failed, e.g. for cron
+    raise SystemExit(0 if interface(args=args) else 1)
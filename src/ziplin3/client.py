@@ -8,21 +8,168 @@ compression, zip is superior for cross-platform compatibility.
 '''
 
 import os
+import re
+import mmap
+import shlex
+import signal
+import socket
 import json
+import atexit
 import base64
 import paramiko
 from pathlib import PosixPath, PurePosixPath, Path
-from time import sleep
 from cryptography.fernet import Fernet
 from traceback import print_exc
-from time import time
+from time import time, strftime, localtime
 from datetime import datetime, timedelta
 import shutil
 import hashlib
 import getpass
+import zipfile
+import tarfile
+import zlib
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+try:
+    import blake3
+except ImportError:
+    blake3 = None # checksums fall back to xxh64 or md5
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None # checksums fall back to md5
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None # zstd containers are not available
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None # the checksum cache is locked within the process only
 
 __root__ = Path(__file__).parent
 
+# remote commands by checksum algorithm
+CHECKSUM_COMMANDS = {'blake3': 'b3sum', 'xxh64': 'xxh64sum', 'md5': 'md5sum'}
+
+# local checksums are kept across backups in the user cache
+CHECKSUM_CACHE = Path.home().joinpath('.cache', 'ziplin3', 'checksums.json')
+
+# entries kept in the checksum cache, beyond that entries of deleted
+# files are pruned first, then the least recently hashed ones
+CHECKSUM_CACHE_ENTRIES = 1<<18
+
+# sessions the ssh server accepts per connection (OpenSSH MaxSessions
+# default), of which EXEC_SESSIONS serve remote commands at a time and one
+# serves client.sftp, the rest bounds the parallel uploads (see client.send)
+SSH_MAX_SESSIONS = 10
+EXEC_SESSIONS = 2
+
+# serializes the checksum cache updates of all clients in the process
+checksum_cache_lock = threading.Lock()
+
+# archive file types, which are not compressed again
+ARCHIVE_SUFFIXES = frozenset({'.zip', '.rar', '.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tar.xz', '.txz', '.tar.zst', '.7z'})
+
+# container suffixes of the formats written by client.compress_stream
+STREAM_SUFFIXES = {'zip': '.zip', 'zstd': '.tar.zst'}
+
+# file types which are compressed already
+INCOMPRESSIBLE_SUFFIXES = {
+    '.jpg', '.jpeg', '.png', '.gif', '.webp', '.heic',
+    '.mp3', '.aac', '.ogg', '.flac', '.opus', '.m4a',
+    '.mp4', '.mkv', '.mov', '.avi', '.webm', '.m4v',
+    '.zip', '.rar', '.7z', '.gz', '.tgz', '.bz2', '.xz', '.zst', '.lz4',
+    '.jar', '.apk', '.docx', '.xlsx', '.pptx', '.odt', '.pdf'
+}
+
+# terminal width, cached as it is needed on every progress update
+# and refreshed on resize (SIGWINCH, see watch_terminal_size) 
+# or every 100 queries otherwise
+terminal_size = {'columns': shutil.get_terminal_size().columns, 'queries': 0, 'watched': False}
+
+def update_terminal_size (*_) -> None:
+
+    '''
+    Refreshes the cached terminal width.
+    '''
+
+    terminal_size['columns'] = shutil.get_terminal_size().columns
+
+def watch_terminal_size () -> None:
+
+    '''
+    Refreshes the cached terminal width on resize (SIGWINCH), the handler
+    installed before e.g. by curses is chained. This is left to the entry 
+    point, as signals can only be registered from the main thread.
+    '''
+
+    if not hasattr(signal, 'SIGWINCH') or terminal_size['watched']:
+        return
+    
+    previous = signal.getsignal(signal.SIGWINCH)
+
+    def handler (signum, frame) -> None:
+        update_terminal_size()
+        if callable(previous):
+            previous(signum, frame)
+    
+    signal.signal(signal.SIGWINCH, handler)
+    terminal_size['watched'] = True
+
+def terminal_columns () -> int:
+
+    '''
+    Returns the cached terminal width in columns.
+    '''
+
+    if not terminal_size['watched']:
+        terminal_size['queries'] += 1
+        if terminal_size['queries'] % 100 == 0:
+            update_terminal_size()
+    
+    return terminal_size['columns']
+
+# log files by path, kept open in append mode for the process lifetime
+log_files = {}
+
+def get_log_file (log_path: PosixPath|str):
+
+    '''
+    Returns the open log file for provided path, the file is 
+    created if it doesnt exist and opened only once.
+    '''
+
+    log_path = os.fspath(log_path)
+
+    if log_path not in log_files:
+        log_files[log_path] = open(log_path, 'a', buffering=1, encoding="utf-8")
+        atexit.register(log_files[log_path].close)
+    
+    return log_files[log_path]
+
+# log timestamp, formatted once per second
+log_timestamp = {'second': 0, 'text': ''}
+
+def timestamp () -> str:
+
+    '''
+    Returns the formatted timestamp of the current second.
+    '''
+
+    second = int(time())
+    if second != log_timestamp['second']:
+        log_timestamp['text'] = strftime('%d-%m %H:%M:%S', localtime(second))
+        log_timestamp['second'] = second
+    
+    return log_timestamp['text']
+
 def log (*stdout: any, header:str='', log_path: PosixPath|str|None=None, 
          verbose: bool=True, end='\n') -> None:
 
@@ -32,30 +179,20 @@ def log (*stdout: any, header:str='', log_path: PosixPath|str|None=None,
 
     if not verbose and not log_path:
         return
-    
-    if log_path:
-
-        log_path = Path(log_path)
-
-        # create a log file if it doesnt exist
-        if not log_path.exists():
-            log_path.touch()
 
     # assemble output
-    body = '\t'.join(stdout)
-    timestamp = datetime.now().strftime('%d-%m %H:%M:%S')
+    body = '\t'.join(map(str, stdout))
+    stamp = timestamp()
     
     if verbose:
-        output_str = f'{timestamp}  {header}  {body}'
-        pad = ''
+        output_str = f'{stamp}  {header}  {body}'
         if end == '\r':
-            pad = ''.join([' ']*(os.get_terminal_size()[0]-len(output_str)))
-        print(f'{timestamp}  {header}  {body}{pad}', end=end)
+            output_str = output_str.ljust(terminal_columns())
+        print(output_str, end=end)
 
     # log to file
     if log_path:
-        with open(log_path, 'a', encoding="utf-8") as log_file:
-            log_file.write(f'{timestamp}  |  {body}\n')
+        get_log_file(log_path).write(f'{stamp}  |  {body}\n')
 
 def size_format (size_in_bytes: int) -> tuple[float, str]:
 
@@ -67,15 +204,137 @@ def size_format (size_in_bytes: int) -> tuple[float, str]:
         
         suffix = ['b', 'kb', 'mb', 'gb', 'tb']
 
-        # select correct suffix
-        ind = 0
-        while size_in_bytes >= 100:
-            size_in_bytes /= 1024
-            ind += 1
-        size_in_bytes = round(size_in_bytes, 1)
+        # select correct suffix, i.e. the smallest index with
+        # size < 100 * 1024**ind, taken from the bit length
+        ind = min(((int(size_in_bytes) // 100).bit_length() + 9) // 10, len(suffix) - 1)
+        size_in_bytes = round(size_in_bytes / (1 << 10 * ind), 1)
 
         return (size_in_bytes, suffix[ind])
 
+def is_compressible (path: str|PosixPath) -> bool:
+
+    '''
+    Estimates whether a file benefits from compression.
+    Known compressed file types are rejected by suffix, for 
+    others the first 4 KiB are test-compressed at level 1.
+    '''
+
+    path = Path(path)
+
+    if path.suffix.lower() in INCOMPRESSIBLE_SUFFIXES:
+        return False
+    
+    with open(path, 'rb') as file:
+        sample = file.read(4096)
+    
+    return not sample or len(zlib.compress(sample, 1)) < .95 * len(sample)
+
+def compressible_share (path: str|PosixPath, samples: int=64) -> float:
+
+    '''
+    Returns the share of compressible files among the first 
+    samples files found in the provided file or directory path.
+    '''
+
+    path = Path(path)
+
+    if path.is_file():
+        return float(is_compressible(path))
+    
+    compressible = total = 0
+    for node in path.rglob('*'):
+        if not node.is_file():
+            continue
+        compressible += is_compressible(node)
+        total += 1
+        if total == samples:
+            break
+    
+    return compressible / total if total else 1.
+
+def copy_file (origin_path: str|PosixPath, target_path: str|PosixPath) -> None:
+
+    '''
+    Copies a local file within the kernel. copy_file_range is used where 
+    available, which lets file systems like Btrfs or XFS share the blocks 
+    (reflink), shutil.copyfile (sendfile) otherwise. Some file systems 
+    (e.g. procfs, some FUSE or NFS mounts) report an early end of file 
+    to copy_file_range, those files are copied again in user space.
+    '''
+
+    if hasattr(os, 'copy_file_range'):
+        try:
+            with open(origin_path, 'rb') as src, open(target_path, 'wb') as dst:
+                copied = 0
+                while size_copied := os.copy_file_range(src.fileno(), dst.fileno(), 1<<30):
+                    copied += size_copied
+                # an empty copy is checked too, as e.g. procfs 
+                # reports a size of 0 for files with contents
+                if not copied or copied != os.fstat(src.fileno()).st_size:
+                    src.seek(0)
+                    dst.seek(0)
+                    dst.truncate()
+                    shutil.copyfileobj(src, dst)
+            return
+        except OSError:
+            pass # e.g. not supported across file systems by older kernels
+    
+    shutil.copyfile(origin_path, target_path)
+
+def checksum_version (algorithm: str, stat: os.stat_result) -> list:
+
+    '''
+    Returns the version of a local file under which its checksum is 
+    cached, see client.checksum. Besides size and modification time it
+    holds the inode and change time, since an edit which keeps size
+    and modification time (the case checksums are compared for) still
+    changes the latter, which cannot be set back.
+    '''
+
+    return [algorithm, stat.st_size, stat.st_mtime_ns, stat.st_ctime_ns, stat.st_ino]
+
+class counting_writer:
+
+    '''
+    Write-only file object which forwards to fileobj, counts the
+    bytes written and feeds them to digest if provided. It cannot
+    seek, so zipfile writes through it in streaming mode.
+    '''
+
+    def __init__ (self, fileobj, digest=None) -> None:
+
+        self.fileobj = fileobj
+        self.digest = digest
+        self.size = 0
+    
+    def write (self, data) -> int:
+
+        if self.digest:
+            self.digest.update(data)
+        self.fileobj.write(data)
+        self.size += len(data)
+
+        return len(data)
+    
+    def flush (self) -> None:
+
+        self.fileobj.flush()
+
+@dataclass(slots=True)
+class progress:
+
+    '''
+    Progress counters of a backup in bytes, replaced 
+    by a fresh instance whenever a backup starts.
+    '''
+
+    total: int = 0          # total size of the origin
+    completed: int = 0      # checked size
+    copied: int = 0         # actually copied size
+    deleted: int = 0
+    files_sent: int = 0
+    files_failed: int = 0
+
 class client (paramiko.SSHClient):
 
     def __init__ (self) -> None:
@@ -89,30 +348,46 @@ class client (paramiko.SSHClient):
         self.ssh_enabled = False
         self.sftp = None
 
+        # checksum algorithm, probed once on first use, and local 
+        # checksums as {path: version + [checksum]} (see checksum_version)
+        # loaded from CHECKSUM_CACHE on first use
+        self.checksum_algorithm = None
+        self.local_sums = None
+        self.local_sums_changed = set() # paths hashed since loaded
+
+        # work pools for parallel file checks and transfers, each 
+        # worker thread owns an sftp channel on the shared transport
+        self.check_pool = None
+        self.pool = None
+        self.sftp_channels = {}
+        self.lock = threading.Lock()
+
+        # remote commands share EXEC_SESSIONS channels at a time
+        self.exec_slots = threading.Semaphore(EXEC_SESSIONS)
+
         # store routes: origin-target-pairs
         self.routes = {}
         self.host = 'localhost'
 
         self.bar_sym = '█'
-        self.completed_size = 0
-        self.copied_size = 0      # actually copied size
-        self.deleted_size = 0
-        self.files_sent = 0
-        self.pad = ''.join([' ']*100)
-        self.total_backup_size = 0
-        self.progress = 0
+        self.bar_full = self.bar_sym * 50
+        self.bar_empty = ' ' * 50
+        self.pad = ' ' * 100
+        self.progress = progress()
         self.process = 0
     
     def backup (self, origin_path: str|PosixPath, target_path: str|PosixPath, 
                 compress: bool=False, compress_format: str='zip', clean_artifacts: bool=True, 
-                force: bool=False, verbose: bool=True, log_path: PosixPath|str|None=None, progress_bar:bool=True) -> bool:
+                force: bool=False, verbose: bool=True, log_path: PosixPath|str|None=None, progress_bar:bool=True,
+                compresslevel: int|None=None, checksum: bool=False, workers: int=8, batch_small: bool=False) -> bool:
 
         '''
         Backups the origin path (host) which points at a file or directory, to target
         path, the destination diectory on host or remote client if ssh is enabled.
 
         If compress is true the origin_path will be zipped, but only if it's not an 
-        archive already e.g. of type .zip, .rar, .tar.
+        archive already e.g. of type .zip, .rar, .tar. Already compressed files
+        are stored in zip containers without deflating them again.
 
         [Parameters]
         origin_path         path to file as string or posix
@@ -122,7 +397,8 @@ class client (paramiko.SSHClient):
                             if enabled will create an archive from origin_path 
                             which will be sent as a single 'file'
         compress_format     a compression format, default: 'zip' 
-                            other registered formats: rar, tar.
+                            other registered formats: zstd (tar.zst, 
+                            multi-threaded), tar, gztar.
                             Note: Although RAR is faster for large file 
                             compression, zip is superior for 
                             cross-platform compatibility.
@@ -130,6 +406,18 @@ class client (paramiko.SSHClient):
                             which are not tracked in corresponding origin_path.
         force               if enabled will ignorantly copy everything
         verbose             verbose shell output
+        compresslevel       compression level, default: 6 for zip (0-9), 
+                            3 for zstd (1-22)
+        checksum            if enabled will compare checksums of files even 
+                            if size and modification time match
+        workers             number of files transferred in parallel, for
+                            remote hosts at most SSH_MAX_SESSIONS - EXEC_SESSIONS - 1
+        batch_small         if enabled will send files below 64 KiB to
+                            remote hosts in a single tar stream
+
+        [Return]
+        True if the backup completed without errors, otherwise False
+        (see the log for the failed files).
         '''
 
         start_ts = datetime.now()
@@ -140,51 +428,109 @@ class client (paramiko.SSHClient):
         origin_path = Path(origin_path)
         target_path = PurePosixPath(target_path)
 
-        # check if the origin path is a zip already
-        is_archive = False
-        for ext in ['.zip', '.rar', '.tar']:
-            if ext in origin_path.name:
-                is_archive = True
-                break
-        
-        # for both cases (file, or dir) create an archive
-        # if compression is enabled
-        if compress and not is_archive:
-            zipPath = origin_path.parent.joinpath( origin_path.name + '.zip' )
-            log(f'prepare zip container {zipPath} ...', verbose=verbose)
-            self.compress(origin_path, compress=compress_format)
-            # transform origin path to zip path
-            origin_path = zipPath
+        # a missing origin would otherwise pass as an empty backup
+        if not origin_path.exists():
+            log(f'{origin_path} ---> {self.host}:{target_path}:', 'origin does not exist', header='error', verbose=verbose, log_path=log_path)
+            return False
+
+        # check if the origin path is an archive already
+        is_archive = origin_path.suffix.lower() in ARCHIVE_SUFFIXES or \
+                     ''.join(origin_path.suffixes[-2:]).lower() in ARCHIVE_SUFFIXES
+        
+        # zip and zstd containers for remote hosts are streamed 
+        # directly into the target file, nothing is written to local disk
+        stream = compress and not is_archive and self.ssh_enabled and compress_format in STREAM_SUFFIXES
+
+        # compressing tar formats does not pay off if 
+        # the content is mostly compressed already
+        if compress and not is_archive and compress_format in ('gztar', 'bztar', 'xztar') and compressible_share(origin_path) < .3:
+            log(f'{origin_path} is mostly compressed already, fall back to tar format', verbose=verbose, log_path=log_path)
+            compress_format = 'tar'
 
         # backup
+        success = False
+        archive_path = remote_part = None
         try:
-            # sends all contents in origin_path recursively into target_path
-            self.send(origin_path, target_path, force, clean_artifacts, verbose, log_path=log_path)
-        except:
+            # for both cases (file, or dir) create an archive
+            # if compression is enabled
+            if compress and not is_archive and not stream:
+                log(f'prepare {compress_format} container for {origin_path} ...', verbose=verbose)
+                # transform origin path to archive path
+                origin_path = archive_path = self.compress(origin_path, format=compress_format, compresslevel=compresslevel)
+
+            if stream:
+                # stream the container into target_path
+                remote_archive = target_path.joinpath(origin_path.name + STREAM_SUFFIXES[compress_format])
+                log(f'stream {compress_format} container {origin_path} ---> {self.host}:{remote_archive} ...', verbose=verbose, log_path=log_path)
+                # the container is hashed on the way if checksums are
+                # enabled, the written bytes are counted in any case
+                sftp = self.get_sftp()
+                if checksum:
+                    algorithm = self.get_checksum_algorithm()
+                # the previous container is only replaced by a complete one
+                remote_part = remote_archive.as_posix() + '.part'
+                with sftp.open(remote_part, 'wb') as remote_file:
+                    remote_file.set_pipelined(True)
+                    writer = counting_writer(remote_file, self.get_digest(algorithm) if checksum else None)
+                    self.compress_stream(origin_path, writer, compresslevel, compress_format)
+                size = writer.size
+                # the digest of the sent bytes is verified against the
+                # container as received, before it replaces the previous one
+                if checksum:
+                    if self.checksum(remote_part, remote=True) != writer.digest.hexdigest():
+                        raise ValueError(f'{algorithm} checksum of {self.host}:{remote_part} does not match the sent container')
+                    log(f'{algorithm} checksum of {remote_archive}: {writer.digest.hexdigest()}', verbose=verbose, log_path=log_path)
+                sftp.posix_rename(remote_part, remote_archive.as_posix())
+                remote_part = None
+                self.progress = progress(total=size, completed=size, copied=size, files_sent=1)
+                success = True
+            else:
+                # sends all contents in origin_path recursively into target_path
+                success = self.send(origin_path, target_path, force, clean_artifacts, verbose, log_path=log_path, checksum=checksum, workers=workers, batch_small=batch_small)
+        except (paramiko.SSHException, OSError, ValueError) as e:
+            log(f'{origin_path} ---> {self.host}:{target_path}:', e, header='error', verbose=False, log_path=log_path)
             print_exc()
-
-        # remove the zip if it was compressed
-        if compress and not is_archive:
-            origin_path.unlink()
+        finally:
+            # remove the archive if it was compressed locally,
+            # also if the backup was aborted by any other error
+            if archive_path:
+                archive_path.unlink(missing_ok=True)
+            # remove an incomplete remote container
+            if remote_part:
+                try:
+                    self.get_sftp().remove(remote_part)
+                except (paramiko.SSHException, OSError):
+                    pass # e.g. the connection is lost
 
         # determine backup time
         dt = datetime.now() - start_ts
-        copied = size_format(self.copied_size)
-        checked = size_format(self.completed_size)
-        completed = size_format(self.completed_size)
+        copied = size_format(self.progress.copied)
+        checked = size_format(self.progress.completed)
+        completed = size_format(self.progress.total)
 
         # output
         log(f'\n\nBackup time: {str(dt)}', header='info', verbose=verbose, log_path=log_path)
         log(f'Backup size: {completed[0]} {completed[1]} ', header='info', verbose=verbose, log_path=log_path)
         log(f'Checked    : {checked[0]} {checked[1].upper()}', header='info', verbose=verbose, log_path=log_path)
         log(f'Copied     : {copied[0]} {copied[1].upper()}', header='info', verbose=verbose, log_path=log_path)
-        log(f'Files sent : {self.files_sent}', header='info')
-        log(header=f'🏁 successfully backed up {origin_path.name}.', verbose=verbose, log_path=log_path)
+        log(f'Files sent : {self.progress.files_sent}', header='info')
+        if success:
+            log(header=f'🏁 successfully backed up {origin_path.name}.', verbose=verbose, log_path=log_path)
+        elif self.progress.files_failed:
+            log(header=f'backup of {origin_path.name} is incomplete, {self.progress.files_failed} files failed.', verbose=verbose, log_path=log_path)
+        else:
+            log(header=f'backup of {origin_path.name} was aborted, see the error above.', verbose=verbose, log_path=log_path)
+
+        # reset progress values
+        self.progress = progress()
+
+        return success
 
     def checksum (self, path: str|PosixPath, remote: bool = False) -> str:
 
         '''
-        Returns checksum in md5 format for provided local or remote file.
+        Returns checksum for provided local or remote file, in blake3 or xxh64 
+        format if available on both hosts, otherwise in md5 format.
 
         [Parameter]
         path            the path to file which needs be checksummed
@@ -192,44 +538,143 @@ class client (paramiko.SSHClient):
         remote          boolean: declares wether the file is on remote or local host system
         '''
 
+        algorithm = self.get_checksum_algorithm()
+
         if remote:
 
             if not self.ssh_enabled:
-                ValueError('Please enable ssh first with client.ssh!')
+                raise ValueError('Please enable ssh first with client.ssh!')
             
             # convert filepath to string
-            if type(path) is PosixPath:
-                path = path.__str__()
+            if type(path) is not str:
+                path = PurePosixPath(path).as_posix()
 
-            cs = self.exec(f'md5sum {path}').split(' ')[0]
+            cs = self.exec(f'{CHECKSUM_COMMANDS[algorithm]} {shlex.quote(path)}').split(' ')[0]
             
             # remote execute
             return cs
         
         else:
+
+            # files are hashed once per version (see checksum_version),
+            # repeated checks are looked up
+            path = os.path.abspath(path)
+            with open(path, 'rb', buffering=0) as file:
+
+                stat = os.fstat(file.fileno())
+                version = checksum_version(algorithm, stat)
+                local_sums = self.get_local_sums()
+                entry = local_sums.get(path)
+                if entry and entry[:-1] == version:
+                    return entry[-1]
+                
+                cs = self.checksum_file(file, stat.st_size, algorithm, path)
+                local_sums[path] = version + [cs]
+                self.local_sums_changed.add(path)
+                
+                return cs
+
+    def checksum_file (self, file, size: int, algorithm: str, path: str|None=None) -> str:
+
+        '''
+        Returns the checksum of an open, unbuffered local file of 
+        provided size in the provided algorithm, see client.checksum.
+        If the path of the file is provided, large files are hashed
+        with blake3 on all cores outside the interpreter.
+        '''
+        
+        digest = self.get_digest(algorithm)
+
+        # large files are mapped and hashed by blake3 itself, which
+        # splits the tree hash across threads and releases the GIL
+        if algorithm == 'blake3' and path and size >= 1<<26 and hasattr(digest, 'update_mmap'):
+            try:
+                digest.update_mmap(path)
+                return digest.hexdigest()
+            except OSError:
+                pass # not mappable, hashed below
+
+        # small files are read in one go, mapping 
+        # them costs more than it saves
+        if size < 1<<20:
+            digest.update(file.readall())
+            return digest.hexdigest()
+        
+        # larger files are hashed from the page cache 
+        # without copying into a read buffer
+        try:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if hasattr(mmap, 'MADV_SEQUENTIAL'):
+                    mm.madvise(mmap.MADV_SEQUENTIAL)
+                digest.update(mm)
+            return digest.hexdigest()
+        except (OSError, ValueError):
+            pass # not mappable, e.g. on some network file systems
         
-            with open(path, 'rb') as file:
+        # otherwise stream 4 MiB chunks through one buffer
+        if hasattr(os, 'posix_fadvise'):
+            os.posix_fadvise(file.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        buffer = bytearray(1<<22)
+        view = memoryview(buffer)
+        while size_read := file.readinto(buffer):
+            digest.update(view[:size_read])
         
-                return hashlib.file_digest(file, 'md5').hexdigest()
+        return digest.hexdigest()
+
+    def checksums (self, paths: list[str|PosixPath]) -> dict:
+
+        '''
+        Returns the checksums of many remote files, see client.checksum,
+        computed with one remote call per 256 files instead of one per file.
+
+        [Return]
+        A dict {posix path: checksum}, files which could not be 
+        checksummed e.g. as they do not exist are left out.
+        '''
+
+        command = CHECKSUM_COMMANDS[self.get_checksum_algorithm()]
+        paths = [PurePosixPath(path).as_posix() for path in paths]
+
+        sums = {}
+        for i in range(0, len(paths), 256):
+            for line in self.exec_lines(command + ' ' + ' '.join(shlex.quote(path) for path in paths[i:i+256])):
+                cs, _, path = line.rstrip('\n').partition('  ')
+                # lines of file names with backslash or newline 
+                # are prefixed, the names are escaped
+                if cs.startswith('\\'):
+                    cs = cs[1:]
+                    path = re.sub(r'\\(.)', lambda match: '\n' if match[1] == 'n' else match[1], path)
+                sums[path] = cs
+        
+        return sums
 
     def clean_artifacts (self, target_path: str|PosixPath, local_dirs: list[str], 
-                         local_files: list[str], verbose: bool=True, log_path: PosixPath|str|None=None) -> None:
+                         local_files: list[str], verbose: bool=True, log_path: PosixPath|str|None=None,
+                         target_attrs: dict|None=None) -> None:
 
         '''
         Will clear all artifacts in provided target_path which are not tracked in corresponding origin_path.
         The base_names in corr. origin_path are splitted across local_dirs and local_files.
+        On remote hosts all artifacts are removed with one 'rm -rf' call per 256 nodes.
 
         [Parameters]
         target_path         the path on remote host in which to clean
         local_dirs          list of expected local dirs in corr. origin branch
         local_files         list of expected local files in corr. origin branch
+        target_attrs        listing of target_path as {name: stat} if known 
+                            already (see client.listdir_attr), spares the listdir
         '''
 
-        remote_names = self.sftp.listdir(target_path.as_posix()) if self.ssh_enabled else os.listdir(target_path)
+        if target_attrs is not None:
+            remote_names = list(target_attrs)
+        else:
+            remote_names = self.get_sftp().listdir(target_path.as_posix()) if self.ssh_enabled else os.listdir(target_path)
                     
+        artifacts = []
+        local_names = set(local_dirs).union(local_files)
         for base_name in remote_names:
             
-            if base_name in local_files or base_name in local_dirs:
+            if base_name in local_names:
                 continue
             
             # otherwise delete file or folder if not in origin dirs or files
@@ -238,58 +683,341 @@ class client (paramiko.SSHClient):
 
             if self.ssh_enabled:
 
-                try: # file
-                    self.sftp.remove(node.as_posix())
-                except IOError: # directory
-                    self.sftp.rmdir(node.as_posix())
+                artifacts.append(node.as_posix())
             
             else:
 
-                if os.path.isdir(str(node.absolute())):
-                    os.rmdir(str(node.absolute()))
+                if os.path.isdir(node):
+                    shutil.rmtree(node)
                 else:
-                    os.remove(str(node.absolute()))
+                    os.remove(node)
+        
+        # remove the remote artifacts in a single round trip per
+        # 256 nodes rather than one sftp request (or two) per node
+        for i in range(0, len(artifacts), 256):
+            try:
+                self.exec('rm -rf -- ' + ' '.join(shlex.quote(node) for node in artifacts[i:i+256]), check=True)
+            except ValueError as e:
+                log(f'clean artifacts in {self.host}:{target_path}:', e, header='error', verbose=False, log_path=log_path)
 
-    def compress (self, path: str|PosixPath, format: str='zip') -> None:
+    def compress (self, path: str|PosixPath, format: str='zip', compresslevel: int|None=None) -> PosixPath:
 
         '''
-        Will create a container from provided directory path 
+        Will create a container from provided file or directory path 
         with same base name and the same (parent) directory.
-        The container is a zip archive with same basename.
+        The container is an archive with same basename.
 
         [Parameter]
-        path            path to directory which should be archived
-        format          a registered format, e.g. zip, tar
+        path            path to file or directory which should be archived
+        format          zip, zstd (tar.zst) or a registered format, e.g. tar
                         for more info see: shutil.make_archive
+        compresslevel   compression level for zip (0-9) and zstd (1-22)
+                        containers, see client.compress_stream
+
+        [Return]
+        The path of the created archive.
         '''
         
         if type(path) is not PosixPath:
             path = Path(path)
-        
-        if not path.is_dir():
-            ValueError('Provided path is not a directory!')
 
         base_name = path.name
         archive_path = path.parent.joinpath(base_name)
-        suffixed_path = archive_path.with_suffix('.'+format)
 
-        shutil.make_archive(archive_path, format=format, root_dir=path)
+        # other registered formats are left to shutil,
+        # which returns once the archive is written
+        if format not in STREAM_SUFFIXES:
+            return Path(shutil.make_archive(str(archive_path), format=format, root_dir=str(path)))
+
+        suffixed_path = path.parent.joinpath(base_name + STREAM_SUFFIXES[format])
 
-        # await the file creation
-        while not suffixed_path.exists():
-            sleep(.001)  
+        # the container is written synchronously, the 
+        # archive is complete once the file is closed,
+        # an incomplete archive is removed
+        try:
+            with open(suffixed_path, 'wb') as archive:
+                self.compress_stream(path, archive, compresslevel, format)
+        except BaseException:
+            suffixed_path.unlink(missing_ok=True)
+            raise
+        
+        return suffixed_path
     
-    def exec (self, command: str) -> str:
+    def compress_stream (self, path: str|PosixPath, fileobj, compresslevel: int|None=None, format: str='zip') -> None:
 
-        _, stdout, stderr = self.exec_command( command )
-        if stderr:
-            ValueError(stderr)
-        return stdout.read().decode('utf-8')
+        '''
+        Streams an archive of the provided file or directory path 
+        into an open, writable file object e.g. a local file or a 
+        remote sftp file, without materializing it anywhere else.
+
+        [Parameter]
+        path            path to file or directory which should be archived
+        fileobj         writable binary file object receiving the archive
+        compresslevel   deflate level (0-9) for zip, default: 6
+                        zstd level (1-22) for zstd, default: 3
+        format          'zip' or 'zstd', the latter writes a tar stream 
+                        compressed with zstd on all cores, which requires 
+                        the zstandard module
+        '''
+
+        path = Path(path)
+
+        if format == 'zstd':
+
+            if not zstandard:
+                raise ValueError('zstd containers require the zstandard module!')
+
+            compressor = zstandard.ZstdCompressor(level=compresslevel or 3, threads=-1)
+            with compressor.stream_writer(fileobj, closefd=False) as stream:
+                with tarfile.open(fileobj=stream, mode='w|') as tar:
+                    if path.is_file():
+                        tar.add(path, arcname=path.name)
+                        return
+                    for node in path.iterdir():
+                        tar.add(node, arcname=node.name)
+            return
+
+        if compresslevel is None:
+            compresslevel = 6
+
+        with zipfile.ZipFile(fileobj, 'w', zipfile.ZIP_DEFLATED, compresslevel=compresslevel, allowZip64=True) as zf:
+
+            if path.is_file():
+                zf.write(path, path.name, self.compress_type(path))
+                return
+            
+            # other nodes are skipped like by shutil.make_archive, 
+            # broken symlinks would abort the archive, fifos block it
+            for node in path.rglob('*'):
+                if node.is_file():
+                    zf.write(node, node.relative_to(path), self.compress_type(node))
+                elif node.is_dir():
+                    zf.write(node, node.relative_to(path))
+                else:
+                    log(f'skip {node}, neither a file nor a directory', header='info')
+    
+    def compress_type (self, path: str|PosixPath) -> int:
+
+        '''
+        Returns the zip compression for a file entry, already 
+        compressed files are stored without deflating them again.
+        '''
+
+        return zipfile.ZIP_DEFLATED if is_compressible(path) else zipfile.ZIP_STORED
+    
+    def exec (self, command: str, check: bool=False) -> str:
+
+        '''
+        Executes a command on the remote host and returns its output.
+        If check is enabled a non-zero exit status raises a ValueError
+        with the error output, otherwise the output is returned anyway 
+        e.g. checksums of the files which do exist.
+        '''
+
+        with self.exec_slots:
+            _, stdout, stderr = self.exec_command( command )
+            with stdout.channel:
+                output = stdout.read().decode('utf-8')
+                if check and stdout.channel.recv_exit_status():
+                    raise ValueError(stderr.read().decode('utf-8'))
+        return output
+    
+    def exec_lines (self, command: str):
+
+        '''
+        Executes a command on the remote host and yields its output 
+        line by line as it arrives, without holding the whole output
+        in memory, see client.exec.
+        '''
+
+        with self.exec_slots:
+            _, stdout, _ = self.exec_command( command )
+            with stdout.channel:
+                for line in stdout:
+                    yield line
     
     def format_progress (self) -> str:
-        fulls = int(self.completed_size / self.total_backup_size * 50)
-        empty = 50 - fulls
-        return '|' + ''.join([self.bar_sym]*fulls) + ''.join([' ']*empty) + f'| ({int(self.completed_size / self.total_backup_size * 100)}%)'
+        # estimate the total size while it is still walked
+        counters = self.progress
+        total = counters.total or counters.completed * 2
+        if not total:
+            return f'|{self.bar_empty}| (0%)'
+        share = min(counters.completed / total, 1)
+        fulls = int(share * 50)
+        return f'|{self.bar_full[:fulls]}{self.bar_empty[fulls:]}| ({int(share * 100)}%)'
+    
+    def get_digest (self, algorithm: str):
+
+        '''
+        Returns a new hash object for provided checksum algorithm.
+        '''
+
+        if algorithm == 'blake3':
+            return blake3.blake3(max_threads=blake3.blake3.AUTO)
+        if algorithm == 'xxh64':
+            return xxhash.xxh64()
+        return hashlib.md5()
+
+    def get_local_sums (self) -> dict:
+
+        '''
+        Returns the cached local checksums, see client.checksum, 
+        which are read from CHECKSUM_CACHE once.
+        '''
+
+        with self.lock:
+            if self.local_sums is None:
+                self.local_sums = self.load_local_sums()
+        
+        return self.local_sums
+
+    def load_local_sums (self) -> dict:
+
+        '''
+        Reads the checksums stored in CHECKSUM_CACHE.
+        '''
+
+        try:
+            with open(CHECKSUM_CACHE, encoding='utf-8') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {} # no or unreadable cache
+
+    def save_local_sums (self) -> None:
+
+        '''
+        Merges the checksums added since loading into CHECKSUM_CACHE, 
+        so concurrent backups (e.g. cron lanes) keep each others entries.
+        The update is locked and the cache replaced atomically through 
+        a unique temporary file, it is pruned to CHECKSUM_CACHE_ENTRIES.
+        '''
+
+        if not self.local_sums_changed:
+            return
+        
+        try:
+            CHECKSUM_CACHE.parent.mkdir(parents=True, exist_ok=True)
+            with checksum_cache_lock, open(CHECKSUM_CACHE.with_suffix('.lock'), 'w') as lock_file:
+
+                # other processes are locked out where supported
+                if fcntl:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+
+                # reinserted entries move to the end, so
+                # the dict stays ordered by hashing time
+                local_sums = self.load_local_sums()
+                for path in self.local_sums_changed:
+                    local_sums.pop(path, None)
+                    local_sums[path] = self.local_sums[path]
+                
+                if len(local_sums) > CHECKSUM_CACHE_ENTRIES:
+                    local_sums = {path: entry for path, entry in local_sums.items() if os.path.exists(path)}
+                    for path in list(local_sums)[:len(local_sums) - CHECKSUM_CACHE_ENTRIES]:
+                        del local_sums[path]
+
+                fd, temp_path = tempfile.mkstemp(dir=CHECKSUM_CACHE.parent, suffix='.tmp')
+                try:
+                    with open(fd, 'w', encoding='utf-8') as file:
+                        json.dump(local_sums, file)
+                    os.replace(temp_path, CHECKSUM_CACHE)
+                except BaseException:
+                    os.unlink(temp_path)
+                    raise
+            
+            self.local_sums = local_sums
+            self.local_sums_changed = set()
+        except OSError:
+            pass # the cache is an optimization only
+
+    def get_checksum_algorithm (self) -> str:
+
+        '''
+        Returns the checksum algorithm, 'blake3', 'xxh64' or 'md5', shared 
+        by local and remote host. blake3 (or xxh64) is selected if the blake3 
+        (or xxhash) module is installed and, for remote backups, b3sum (or 
+        xxh64sum) is available on the remote host. The result is probed
+        once and cached.
+        '''
+
+        if self.checksum_algorithm:
+            return self.checksum_algorithm
+        
+        # remote commands which are available
+        commands = set(CHECKSUM_COMMANDS.values())
+        if self.ssh_enabled:
+            found = self.exec('command -v b3sum xxh64sum').split()
+            commands = {PurePosixPath(command).name for command in found}
+
+        algorithm = 'md5'
+        if blake3 and 'b3sum' in commands:
+            algorithm = 'blake3'
+        elif xxhash and 'xxh64sum' in commands:
+            algorithm = 'xxh64'
+        self.checksum_algorithm = algorithm
+
+        return algorithm
+    
+    def listdir_attr (self, path: str|PosixPath) -> dict:
+
+        '''
+        Lists a local or remote directory in a single call.
+        The path is considered remote if client.ssh_enabled is true.
+
+        [Return]
+        A dict {base name: stat} of all nodes in the directory,
+        remote stats are of type paramiko.SFTPAttributes.
+        '''
+
+        if self.ssh_enabled:
+            return {attr.filename: attr for attr in self.get_sftp().listdir_attr(PurePosixPath(path).as_posix())}
+        
+        with os.scandir(path) as entries:
+            return {entry.name: entry.stat() for entry in entries}
+
+    def get_sftp (self) -> paramiko.SFTPClient:
+
+        '''
+        Returns the sftp channel owned by the calling thread,
+        channels are opened lazily on the shared transport and
+        stay open until client.close_sftp is called.
+        The main thread uses client.sftp, which is kept open
+        for the lifetime of the client (see client.close).
+        '''
+
+        if threading.current_thread() is threading.main_thread():
+            if not self.sftp:
+                self.sftp = self.open_sftp()
+            return self.sftp
+
+        ident = threading.get_ident()
+        if ident not in self.sftp_channels:
+            self.sftp_channels[ident] = self.open_sftp()
+        
+        return self.sftp_channels[ident]
+    
+    def close_sftp (self, workers_only: bool=False) -> None:
+
+        '''
+        Closes all sftp channels of worker threads and,
+        unless workers_only is enabled, client.sftp.
+        '''
+
+        if self.sftp and not workers_only:
+            self.sftp = self.sftp.close()
+        
+        for sftp in self.sftp_channels.values():
+            sftp.close()
+        self.sftp_channels = {}
+    
+    def close (self) -> None:
+
+        '''
+        Closes all sftp channels and the ssh connection.
+        '''
+
+        self.close_sftp()
+        super().close()
+        self.ssh_enabled = False
     
     def get_size (self, path: str|PosixPath) -> int:
 
@@ -304,12 +1032,29 @@ class client (paramiko.SSHClient):
         The node size in integer bytes.
         '''
 
-        path = Path(path)
+        path = os.fspath(path)
+
+        if not os.path.isdir(path):
+            return os.path.getsize(path)
+        
+        # walk the tree with a stack, directory entries 
+        # carry the file type without an extra stat
+        total = 0
+        stack = [path]
+        while stack:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        total += entry.stat(follow_symlinks=False).st_size
         
-        return sum(f.stat().st_size for f in path.glob('**/*') if f.is_file()) if path.is_dir() else path.stat().st_size
+        return total
 
     def send_file (self, origin_path: str|PosixPath, target_path: str|PosixPath, 
-                  force: bool=False, verbose: bool=True, log_path: PosixPath|str|None=None) -> None:
+                  force: bool=False, verbose: bool=True, log_path: PosixPath|str|None=None, checksum: bool=False,
+                  target_attrs: dict|None=None, upload_pool: ThreadPoolExecutor|None=None, target_sums: dict|None=None,
+                  origin_stat: os.stat_result|None=None) -> None:
 
         '''
         Sends a file from origin_path to target_path.
@@ -320,31 +1065,77 @@ class client (paramiko.SSHClient):
         origin_path         path to file as string or posix
         target_path         destination directory path as string or posix.
                             Directory needs to exist already.
+        checksum            if enabled will always compare checksums
+        target_attrs        listing of the target directory as {name: stat}
+                            if known already, spares the stat of the target file
+        upload_pool         work pool to hand the upload to once the check 
+                            is done, if None the file is uploaded right away
+        target_sums         checksums of target files as {posix path: checksum}
+                            if known already (see client.checksums)
+        origin_stat         stat of origin_path if known already e.g. 
+                            from os.scandir, spares the stats of the origin
         '''
 
-        # check if this is a one-time use to activate sftp
-        one_time_sftp = False
-        if not self.sftp:
-            one_time_sftp = True
-            self.sftp = self.open_sftp()
-
-        # set the types correctly
-        origin_path = Path(origin_path)
-        target_path = PurePosixPath(target_path)
+        # set the types correctly, paths passed by client.send 
+        # are typed already and are not parsed again
+        if not isinstance(origin_path, Path):
+            origin_path = Path(origin_path)
+        if not isinstance(target_path, PurePosixPath):
+            target_path = PurePosixPath(target_path)
 
         # paramiko requires target_path to include the filename,
         # so append it.
         # https://github.com/paramiko/paramiko/issues/1000
         target_path = target_path.joinpath(origin_path.name)
 
-        # determine file size and aggregate to completed bytes
-        size = self.get_size(origin_path)
-        self.completed_size += size
+        # the check runs in the check pool, whose futures are not
+        # awaited, so failures are logged and counted right here
+        try:
+
+            # determine file size and aggregate to completed bytes
+            if origin_stat is None:
+                origin_stat = origin_path.stat()
+            size = origin_stat.st_size
+            with self.lock:
+                self.progress.completed += size
+            
+            # a file missing in the target listing does not exist yet
+            target_stat = None
+            exists = True
+            if target_attrs is not None:
+                target_stat = target_attrs.get(origin_path.name)
+                exists = target_stat is not None
+
+            # check if there is a difference in origin and target
+            target_sum = target_sums.get(target_path.as_posix()) if target_sums else None
+            if exists and self.is_identical(origin_path, target_path, self.ssh_enabled, force, checksum, target_stat, target_sum, origin_stat):
+                log(f'{target_path} is already up-to-date with origin.', header=self.format_progress(), verbose=verbose, log_path=log_path, end='\r')
+                return
         
-        # check if there is a difference in origin and target
-        if self.is_identical(origin_path, target_path, self.ssh_enabled, force):
-            log(f'{target_path} is already up-to-date with origin.', header=self.format_progress(), verbose=verbose, log_path=log_path, end='\r')
+        except Exception as e:
+
+            log(f'check {origin_path} ---> {self.host}:{target_path}:', e, header='error', verbose=False, log_path=log_path)
+            with self.lock:
+                self.progress.files_failed += 1
             return
+        
+        if upload_pool:
+            upload_pool.submit(self.upload_file, origin_path, target_path, size, verbose=verbose, log_path=log_path, 
+                               origin_stat=origin_stat, checksum=checksum)
+        else:
+            self.upload_file(origin_path, target_path, size, verbose=verbose, log_path=log_path, 
+                             origin_stat=origin_stat, checksum=checksum)
+    
+    def upload_file (self, origin_path: PosixPath, target_path: PurePosixPath, size: int, 
+                     verbose: bool=True, log_path: PosixPath|str|None=None, origin_stat: os.stat_result|None=None,
+                     checksum: bool=False) -> None:
+
+        '''
+        Copies a file from origin_path to target_path (including the file name)
+        without any check, see client.send_file. If checksum is enabled, remote 
+        uploads hash the file on the way, so the next backup finds its 
+        checksum cached instead of reading the file again.
+        '''
 
         # try to copy
         try:
@@ -354,32 +1145,157 @@ class client (paramiko.SSHClient):
 
             if self.ssh_enabled:
                 # move remotely if client.ssh was called apriori
-                self.sftp.put(str(origin_path), target_path.as_posix())
+                # the file is written in 1 MiB chunks with pipelined 
+                # requests, so writes do not wait for acknowledgement;
+                # chunks are read into one buffer and passed unbuffered
+                # as memoryview slices, which paramiko splits into 32 KiB
+                # requests, the size every sftp server must accept 
+                # (OpenSSH accepts writes up to about 256 KiB)
+                sftp = self.get_sftp()
+                if origin_stat is None:
+                    origin_stat = origin_path.stat()
+                if checksum:
+                    algorithm = self.get_checksum_algorithm()
+                    digest = self.get_digest(algorithm)
+                with open(origin_path, 'rb', buffering=0) as src, sftp.open(target_path.as_posix(), 'wb', bufsize=0) as dst:
+                    # the version of the file actually read, see checksum_version
+                    if checksum:
+                        version = checksum_version(algorithm, os.fstat(src.fileno()))
+                    # announce the sequential read for a larger readahead
+                    if hasattr(os, 'posix_fadvise'):
+                        os.posix_fadvise(src.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+                    dst.set_pipelined(True)
+                    buffer = bytearray(1<<20)
+                    view = memoryview(buffer)
+                    while size_read := src.readinto(buffer):
+                        dst.write(view[:size_read])
+                        if checksum:
+                            digest.update(view[:size_read])
+                # keep the modification time for the stat quick-check
+                sftp.utime(target_path.as_posix(), (origin_stat.st_atime, origin_stat.st_mtime))
+                # the checksum of the sent version is the origin checksum
+                # of the next backup, which spares reading it again
+                # (see client.checksum)
+                if checksum:
+                    path = os.path.abspath(origin_path)
+                    local_sums = self.get_local_sums()
+                    with self.lock:
+                        local_sums[path] = version + [digest.hexdigest()]
+                        self.local_sums_changed.add(path)
             else:
-                # move file locally
-                shutil.move(str(origin_path), str(target_path))
+                # copy file locally in-kernel, the origin stays intact
+                copy_file(origin_path, target_path)
+                # keep the modification time for the stat quick-check
+                if origin_stat is None:
+                    origin_stat = origin_path.stat()
+                os.utime(target_path, ns=(origin_stat.st_atime_ns, origin_stat.st_mtime_ns))
             if verbose: 
                 log(f'{origin_path} ---> {self.host}:{target_path}', verbose=False, log_path=log_path)
             
-            # close the sftp if one-time use
-            if one_time_sftp:
-                self.sftp = self.sftp.close()
-            
             # denote the copied size
-            self.copied_size += size
-            self.files_sent  += 1
+            with self.lock:
+                self.progress.copied += size
+                self.progress.files_sent += 1
         
         except Exception as e:
                 
             log(f'{origin_path} ---> {self.host}:{target_path}:', e, header='error', verbose=False, log_path=log_path)
+            with self.lock:
+                self.progress.files_failed += 1
+            
+    def send_batch (self, files: list[tuple], target_path: str|PosixPath, force: bool=False, 
+                    verbose: bool=True, log_path: PosixPath|str|None=None, checksum: bool=False) -> None:
+
+        '''
+        Sends many small files to the remote host in a single tar stream 
+        piped into 'tar -x' on the remote host, instead of one sftp upload 
+        per file. Files which are up-to-date with origin are left out.
+
+        [Parameter]
+        files               list of (origin file, target directory, target listing, 
+                            origin stat) tuples, with target directories below target_path
+        target_path         remote directory in which the tar stream is extracted
+        force               if enabled will always send the files
+        checksum            if enabled will always compare checksums
+        '''
+
+        target_path = PurePosixPath(target_path)
+
+        # remote checksums of files which pass the quick-check 
+        # undecided are computed in one go for the batch
+        target_sums = None
+        if not force:
+            undecided = [target_dir.joinpath(origin_file.name) for origin_file, target_dir, target_attrs, origin_stat in files 
+                         if origin_file.name in target_attrs and 
+                         self.quick_check(origin_stat, target_attrs[origin_file.name], checksum) is None]
+            if undecided:
+                target_sums = self.checksums(undecided)
+
+        # select the files which differ from origin
+        pending = []
+        for origin_file, target_dir, target_attrs, origin_stat in files:
+
+            size = origin_stat.st_size
+            with self.lock:
+                self.progress.completed += size
             
+            target_file = target_dir.joinpath(origin_file.name)
+            target_stat = target_attrs.get(origin_file.name)
+            target_sum = target_sums.get(target_file.as_posix()) if target_sums else None
+            if target_stat is not None and self.is_identical(origin_file, target_file, self.ssh_enabled, force, checksum, target_stat, 
+                                                             target_sum, origin_stat):
+                log(f'{target_file} is already up-to-date with origin.', header=self.format_progress(), verbose=verbose, log_path=log_path, end='\r')
+                continue
+
+            pending.append((origin_file, target_file.relative_to(target_path), size))
+        
+        if not pending:
+            return
+        
+        try:
+
+            log(f'batch of {len(pending)} small files', header=self.format_progress(), verbose=verbose, end='\r')
+
+            with self.exec_slots, self.get_transport().open_session() as channel:
+
+                # the extracted files belong to the remote user,
+                # like files uploaded with sftp
+                channel.exec_command(f'tar -x --no-same-owner -C {shlex.quote(target_path.as_posix())}')
+
+                # tar keeps the modification times for the stat quick-check,
+                # symlinks are followed, as sftp uploads send the contents
+                with channel.makefile('wb') as stdin:
+                    with tarfile.open(fileobj=stdin, mode='w|', dereference=True) as tar:
+                        for origin_file, arcname, _ in pending:
+                            tar.add(str(origin_file), arcname=arcname.as_posix())
+                channel.shutdown_write()
+
+                if channel.recv_exit_status():
+                    raise IOError(channel.makefile_stderr('rb').read().decode('utf-8'))
+            
+            for origin_file, arcname, _ in pending:
+                log(f'{origin_file} ---> {self.host}:{target_path.joinpath(arcname)}', verbose=False, log_path=log_path)
+
+            # denote the copied size
+            with self.lock:
+                self.progress.copied += sum(size for *_, size in pending)
+                self.progress.files_sent += len(pending)
+        
+        except Exception as e:
+
+            log(f'batch ---> {self.host}:{target_path}:', str(e), header='error', verbose=False, log_path=log_path)
+            with self.lock:
+                self.progress.files_failed += len(pending)
+
     def send (self, origin_path: str|PosixPath, target_path: str|PosixPath, 
-              force: bool=False, clean_artifacts: bool=True, verbose: bool=True, log_path: PosixPath|str|None=None) -> None:
+              force: bool=False, clean_artifacts: bool=True, verbose: bool=True, log_path: PosixPath|str|None=None, 
+              checksum: bool=False, workers: int=8, batch_small: bool=False) -> bool:
 
         '''
         Sends a file or whole directory at origin into a directory at target_path.
         If client.ssh was called beforehand, the target_path will
         be assumed to be located on the remote system.
+        Returns True if no file failed to transfer.
 
         [Parameter]
         origin_path:        path to file as string or posix
@@ -388,73 +1304,170 @@ class client (paramiko.SSHClient):
         clean_artifact      if enabled will remove all files in target which are not 
                             tracked in origin
         verbose             if enabled will log process in shell
+        checksum            if enabled will compare checksums even if 
+                            size and modification time match
+        workers             number of files transferred in parallel, for
+                            remote hosts at most SSH_MAX_SESSIONS - EXEC_SESSIONS - 1
+        batch_small         if enabled will send files below 64 KiB to remote
+                            hosts in a single tar stream (see client.send_batch)
         '''
 
         # remember the root level
         root = False
-        if not self.total_backup_size:
+        if not self.pool:
             root = True
-            self.total_backup_size = self.get_size(origin_path)
-
-        # convert paths to posix
-        origin_path = Path(origin_path)
-        target_path = PurePosixPath(target_path)
-
-        # open sftp connection
-        if self.ssh_enabled:
-            self.sftp = self.open_sftp()
-        
-        # origin_path pointing at directory
-        if origin_path.is_dir():
-
-            # apriori check if the target directory exists (as it should not)
-            # if not create it remote or locally
-            target_basename = origin_path.name
-            target_final = target_path.joinpath(target_basename)
-            if not self.path_exists(target_final.as_posix(), remote=self.ssh_enabled):
-                if self.ssh_enabled:
-                    self.sftp.mkdir(target_final.as_posix())
+            self.progress = progress()
+
+            # walk the total size in the background, so the first 
+            # transfers do not wait for it (see client.format_progress)
+            size_pool = ThreadPoolExecutor(max_workers=1)
+            size_future = size_pool.submit(self.get_size, origin_path)
+            def set_total (future) -> None:
+                if future.exception() is None:
+                    self.progress.total = future.result()
                 else:
-                    os.mkdir(str(target_final))
-
-            # override the current target_path with the new base name
-            target_path = target_final
-            
-            for _, dirs, files in os.walk(str(origin_path.absolute())):
-                
-                # send all files in current pointer directory
-                for file in files:
-
-                    # file has an extension already!
-                    file_path = origin_path.joinpath(file)
-                    self.send_file(file_path, target_path, force=force, verbose=verbose, log_path=log_path)
+                    log(f'size of {origin_path}:', future.exception(), header='error', verbose=False, log_path=log_path)
+            size_future.add_done_callback(set_total)
+            size_pool.shutdown(wait=False)
+
+            # every upload worker owns an sftp session, which 
+            # with client.sftp and the command channels must fit
+            # into the sessions the server accepts
+            if self.ssh_enabled and workers > SSH_MAX_SESSIONS - EXEC_SESSIONS - 1:
+                workers = SSH_MAX_SESSIONS - EXEC_SESSIONS - 1
+                log(f'workers are limited to {workers} by the ssh sessions per connection', verbose=False, log_path=log_path)
+
+            # open the work pools, files pass a check stage 
+            # (stat, checksum) and then an upload stage
+            self.check_pool = ThreadPoolExecutor(max_workers=os.cpu_count() or 1)
+            self.pool = ThreadPoolExecutor(max_workers=workers)
 
-                # next recurse for directories
-                for dir in dirs:
+        try:
 
-                    dir_path = origin_path.joinpath(dir)
-                    self.send(dir_path, target_path, verbose=verbose, log_path=log_path)
+            # convert paths to posix
+            origin_path = Path(origin_path)
+            target_path = PurePosixPath(target_path)
+        
+            # origin_path pointing at directory
+            if origin_path.is_dir():
+
+                # small files collected for a batch as 
+                # (origin file, target directory, target listing)
+                small_files = []
+
+                # traverse the origin tree top-down with an explicit stack of
+                # (origin directory, target parent directory, parent listing)
+                stack = [(origin_path, target_path, None)]
+                while stack:
+
+                    origin_dir, target_parent, parent_attrs = stack.pop()
+
+                    # apriori check if the target directory exists (as it should not)
+                    # if not create it remote or locally, sub directories are
+                    # looked up in the listing of their parent
+                    target_dir = target_parent.joinpath(origin_dir.name)
+                    if parent_attrs is None:
+                        exists = self.path_exists(target_dir.as_posix(), remote=self.ssh_enabled)
+                    else:
+                        exists = origin_dir.name in parent_attrs
+                    if exists:
+                        # list the target directory once, the attributes
+                        # serve the quick-check of all contained files
+                        target_attrs = self.listdir_attr(target_dir)
+                    else:
+                        if self.ssh_enabled:
+                            self.get_sftp().mkdir(target_dir.as_posix())
+                        else:
+                            os.mkdir(str(target_dir))
+                        target_attrs = {}
+                
+                    dirs, files = [], []
+                    checks = [] # files for the check stage as (entry, stat)
+                    with os.scandir(origin_dir) as entries:
+                        for entry in entries:
+
+                            # queue directories for traversal
+                            if entry.is_dir():
+                                dirs.append(entry.name)
+                                stack.append((origin_dir.joinpath(entry.name), target_dir, target_attrs))
+                                continue
+
+                            # send all files in current pointer directory
+                            # through the work pool
+                            files.append(entry.name)
+
+                            # stat once, a broken symlink or a file deleted 
+                            # meanwhile fails alone, not the whole backup
+                            try:
+                                origin_stat = entry.stat()
+                            except OSError as e:
+                                log(f'{entry.path} ---> {self.host}:{target_dir}:', e, header='error', verbose=False, log_path=log_path)
+                                with self.lock:
+                                    self.progress.files_failed += 1
+                                continue
+
+                            if batch_small and self.ssh_enabled and origin_stat.st_size < 1<<16:
+                                small_files.append((Path(entry.path), target_dir, target_attrs, origin_stat))
+                                continue
+                            checks.append((entry, origin_stat))
+
+                    # remote checksums of files which pass the quick-check 
+                    # undecided are computed in one go for the directory
+                    target_sums = None
+                    if self.ssh_enabled and not force:
+                        undecided = [target_dir.joinpath(entry.name) for entry, origin_stat in checks if entry.name in target_attrs and 
+                                     self.quick_check(origin_stat, target_attrs[entry.name], checksum) is None]
+                        if undecided:
+                            target_sums = self.checksums(undecided)
+
+                    for entry, origin_stat in checks:
+                        self.check_pool.submit(self.send_file, Path(entry.path), target_dir, force=force, verbose=verbose, 
+                                               log_path=log_path, checksum=checksum, target_attrs=target_attrs, upload_pool=self.pool,
+                                               target_sums=target_sums, origin_stat=origin_stat)
+
+                    # cleaning
+                    if clean_artifacts:
+
+                        self.clean_artifacts(target_dir, dirs, files, log_path=log_path, target_attrs=target_attrs)
+
+                # send the small files while the pool keeps sending large ones
+                if small_files:
+                    self.send_batch(small_files, target_path, force=force, verbose=verbose, log_path=log_path, checksum=checksum)
+
+            # origin_path pointing at single file
+            elif origin_path.is_file():
+
+                self.send_file(origin_path, target_path, force=force, verbose=verbose, log_path=log_path, checksum=checksum)
+            
+            # neither file nor directory, e.g. missing
+            else:
 
-                # cleaning
-                if clean_artifacts:
+                log(f'{origin_path} ---> {self.host}:{target_path}:', 'origin is neither a file nor a directory', header='error', 
+                    verbose=verbose, log_path=log_path)
+                with self.lock:
+                    self.progress.files_failed += 1
+        
+        finally:
 
-                    self.clean_artifacts(target_path, dirs, files, log_path=log_path)
+            # the root tears down in any case, otherwise the pools
+            # stay set and the next backup runs as a nested call
+            if root:
 
-                # stop the loop after one iteration
-                return
+                # await all checks, which hand over the last 
+                # uploads, then await all transfers
+                self.check_pool.shutdown(wait=True)
+                self.pool.shutdown(wait=True)
+                self.check_pool = self.pool = None
+                if size_future.exception() is None:
+                    self.progress.total = size_future.result()
 
-        # origin_path pointing at single file
-        elif origin_path.is_file():
+                # close the channels of the finished worker threads
+                self.close_sftp(workers_only=True)
 
-            self.send_file(origin_path, target_path, force=force, verbose=verbose, log_path=log_path)
-        
-        # close the sftp connection
-        if self.ssh_enabled:
-            self.sftp = self.sftp.close() if self.sftp else None
+                # keep the local checksums for the next backup
+                self.save_local_sums()
         
-        # reset progress values
-        if root:
-            self.total_backup_size = self.completed_size = self.copied_size = self.deleted_size = self.files_sent = 0
+        return not self.progress.files_failed
 
     def join (self, path: str, *paths: str) -> str:
 
@@ -470,33 +1483,72 @@ class client (paramiko.SSHClient):
 
         return extendedPath
 
-    def ssh (self, user: str, host: str, password: str|None=None, ssh_path: str|PosixPath|None=None, port: int=22) -> None:
+    def ssh (self, user: str, host: str, password: str|None=None, ssh_path: str|PosixPath|None=None, port: int=22,
+             compression: bool=False) -> None:
         
         '''
         Connects to host via ssh.
-        This method takes either a password or path to ssh file to derve login credentials.
+        This method takes a password or path to ssh file to derve login credentials,
+        if neither is provided the default keys in ~/.ssh and the ssh agent are used.
 
-        ssh_path:    OpenSSH file format
+        ssh_path:       OpenSSH file format
+        compression     if enabled will negotiate ssh transport compression,
+                        pays off for compressible data on slow links
         '''
 
         try:
 
-            if not ssh_path and not password:
-                ValueError('Please provide either a password or an ssh file path')
-
             self.user = user
             self.host = host
             self.port = port
 
-            self.connect(self.host, username=self.user, password=password, key_filename=ssh_path)
+            # channels of a previous connection
+            self.close_sftp()
+
+            self.connect(self.host, port=self.port, username=self.user, password=password, key_filename=ssh_path, 
+                         look_for_keys=True, allow_agent=True, compress=compression, sock=self.create_socket(self.host, self.port))
+
+            # the window advertised for receiving on all channels opened
+            # from here on, so more command output (e.g. batched checksums)
+            # and sftp replies stay in flight on high latency links; uploads 
+            # are bounded by the window the server advertises instead
+            transport = self.get_transport()
+            transport.default_window_size = 2**27 - 1
+            # 32 KiB packets, the size every ssh server must accept
+            transport.default_max_packet_size = 32768
+
+            # rekeying stalls all channels, defer it for large backups
+            transport.packetizer.REKEY_BYTES = 2**40
+            transport.packetizer.REKEY_PACKETS = 2**40
+
+            # keep the connection alive while long checks or 
+            # compressions leave it idle, e.g. behind NAT
+            transport.set_keepalive(30)
             
             # flip the ssh flag
             self.ssh_enabled = True
+
+            # the remote host may support other checksums
+            self.checksum_algorithm = None
         
-        except:
+        except (paramiko.SSHException, OSError):
 
             print_exc()
 
+    def create_socket (self, host: str, port: int=22, timeout: float=30) -> socket.socket:
+
+        '''
+        Returns a tcp socket connected to host with Nagle's algorithm disabled.
+        All resolved addresses (IPv6 and IPv4) are tried in turn within timeout.
+        The kernel buffers are left to tcp autotuning, fixing them would cap 
+        the window at net.core.rmem_max/wmem_max.
+        '''
+
+        sock = socket.create_connection((host, int(port)), timeout=timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        return sock
+
     def path_exists (self, path: str|PosixPath, remote: bool=False) -> bool:
 
         '''
@@ -507,28 +1559,18 @@ class client (paramiko.SSHClient):
         path = Path(path)
 
         if remote and not self.ssh_enabled:
-            ValueError('For calling path_exists on remote host please enable ssh by calling the client.ssh method first!')
+            raise ValueError('For calling path_exists on remote host please enable ssh by calling the client.ssh method first!')
 
         if remote:
 
-            # check if this is a one-time use to activate sftp
-            one_time_sftp = False
-            if not self.sftp:
-                one_time_sftp = True
-                self.sftp = self.open_sftp()
-
             # check remotely
             exists = False
             try:
-                self.sftp.stat(path.as_posix())
+                self.get_sftp().stat(path.as_posix())
                 exists = True
             except IOError:
                 pass # FileNotFoundError if the path is not found
             
-            # close the sftp if one-time use
-            if one_time_sftp:
-                self.sftp = self.sftp.close()
-            
             return exists
 
             # return bool(zl.exec(f'[ -d "{path}" ] && echo 1') + zl.exec(f'[ -f "{path}" ] && echo 1'))
@@ -540,11 +1582,16 @@ class client (paramiko.SSHClient):
         
         return False
 
-    def is_identical (self, origin_path: str|PosixPath, target_path: str|PosixPath, remote: bool=False, force: bool=False):
+    def is_identical (self, origin_path: str|PosixPath, target_path: str|PosixPath, remote: bool=False, 
+                      force: bool=False, checksum: bool=False, target_stat: os.stat_result|paramiko.SFTPAttributes|None=None,
+                      target_sum: str|None=None, origin_stat: os.stat_result|None=None):
 
         '''
         Returns a boolean result from whether two files on the same or varying hosts differ.
-        If the target_path does not exist the return will be true.
+        If the target_path does not exist the return will be False.
+        Files of equal size and modification time are considered identical
+        without reading them (rsync-style quick-check), otherwise the 
+        checksums are compared.
 
         [Parameter]
         origin_path         the origin file
@@ -554,20 +1601,106 @@ class client (paramiko.SSHClient):
         force               if force is enabled the return will be False
                             and everything else is ignored - this will
                             indicate that the files always differ.
+        checksum            if enabled the checksums are compared even
+                            if size and modification time match
+        target_stat         stat of the existing target_path if known already 
+                            e.g. from a directory listing, otherwise None
+        target_sum          checksum of target_path if known already 
+                            e.g. from client.checksums, otherwise None
+        origin_stat         stat of origin_path if known already 
+                            e.g. from os.scandir, otherwise None
         '''
 
-        target_sum = None
-
-        # checks remotely or locally if the given target_path exists
-        # if not creates it
-        if force or not self.path_exists(target_path, remote=remote):
+        if force:
             return False
         
+        # a single stat checks the existence and 
+        # provides size and modification time
+        if not target_stat:
+            try:
+                if remote:
+                    target_stat = self.get_sftp().stat(PurePosixPath(target_path).as_posix())
+                else:
+                    target_stat = os.stat(target_path)
+            except IOError:
+                return False # FileNotFoundError if the path is not found
+        
+        if origin_stat is None:
+            origin_stat = os.stat(origin_path)
+        identical = self.quick_check(origin_stat, target_stat, checksum)
+        if identical is not None:
+            return identical
+        
         # compare checksums
-        target_sum = self.checksum(target_path, remote=remote) 
-        orgin_sum = self.checksum(origin_path)
+        if target_sum is not None:
+            identical = self.checksum(origin_path) == target_sum
+        else:
+            # the target is hashed in a second thread while the origin 
+            # is hashed locally, so both take as long as the slower one
+            with ThreadPoolExecutor(1) as executor:
+                target_future = executor.submit(self.checksum, target_path, remote)
+                orgin_sum = self.checksum(origin_path)
+                identical = orgin_sum == target_future.result()
+        
+        # identical files of differing modification time are settled 
+        # for the quick-check of the next backup, as rsync does
+        if identical and int(origin_stat.st_mtime) != int(target_stat.st_mtime):
+            self.set_mtime(target_path, origin_stat, remote)
+        
+        return identical
+    
+    def set_mtime (self, path: str|PosixPath, stat: os.stat_result, remote: bool=False) -> None:
+
+        '''
+        Sets the access and modification time of a local or 
+        remote file to the ones of provided (origin) stat.
+        '''
+
+        if remote:
+            # sftp requests are thread-safe, check threads share 
+            # client.sftp instead of opening further sessions
+            sftp = self.sftp or self.get_sftp()
+            sftp.utime(PurePosixPath(path).as_posix(), (stat.st_atime, stat.st_mtime))
+        else:
+            os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+    def quick_check (self, origin_stat: os.stat_result, target_stat: os.stat_result|paramiko.SFTPAttributes, 
+                     checksum: bool=False) -> bool|None:
+
+        '''
+        rsync-style quick-check of an origin and target file by their stats.
+        Returns False if the sizes differ, True if size and modification time
+        match (unless checksum is enabled) and None if only checksums can tell.
+        '''
+
+        if origin_stat.st_size != target_stat.st_size:
+            return False
+        
+        if not checksum and int(origin_stat.st_mtime) == int(target_stat.st_mtime):
+            return True
+        
+        return None
+
+@dataclass(slots=True)
+class cron_job:
+
+    '''
+    A backup job scheduled by cron, see cron.addJob.
+    '''
 
-        return orgin_sum == target_sum
+    origin_path: str|PosixPath
+    target_path: str|PosixPath
+    host: str = 'localhost'
+    user: str|None = None
+    sshFilePath: str|None = None
+    compress: bool = True
+    force: bool = False
+    dayTime: str = '00:00'
+    weekday: str = 'Sunday'
+    cadence: str = 'weekly'
+    id: str|None = None
+    fingerprint: str|None = None
+    timestamp: float|None = None
 
 class cron:
 
@@ -576,15 +1709,24 @@ class cron:
     Add jobs which are triggered at specified cadence and day time.
     '''
 
-    def __init__ (self, masterSecret: str) -> None:
+    def __init__ (self, masterSecret: str, lanes: int=2) -> None:
         
         self.jobs = []
         self.dailyStack = [] # a subset of self.jobs
 
+        # work pool for due jobs, which run in parallel with at most 
+        # lanes backups at a time and every job once at a time
+        self.pool = ThreadPoolExecutor(max_workers=lanes)
+        self.running = set()
+        self.lock = threading.Lock()
+
         # derive master key from secret
         self.masterKey = self.keyGen(masterSecret) # do not save master secret
         self.sshFilePath = None
 
+        # Fernet ciphers by key, built once per key
+        self.ciphers = {}
+
     def addJob (self, 
             origin_path: str|PosixPath, 
             target_path: str|PosixPath,
@@ -608,32 +1750,48 @@ class cron:
         '''
 
         # corpus
-        job = {
-            'id': None,
-            'origin_path': origin_path,
-            'target_path': target_path,
-            'host': host,
-            'user': user,
-            'fingerprint': None,
-            'sshFilePath': sshFilePath,
-            'compress': compress,
-            'force': force,
-            'dayTime': dayTime,
-            'weekday': weekDay,
-            'cadence': cadence,
-            'timestamp': None
-        }
-
-        # generate unique job id and label job object
-        job['id'] = hashlib.md5(json.dumps(job).encode('ascii'))
-
-        # generate a fingerprint for job
-        job['fingerprint'] = self.encrypt(self.masterKey, password)
+        job = cron_job(origin_path, target_path, host, user, sshFilePath, 
+                       compress, force, dayTime, weekDay, cadence)
+
+        # generate unique job id from the scheduling fields and label job object
+        id_hash = hashlib.blake2b(digest_size=16)
+        for field in (job.origin_path, job.target_path, job.host, job.user, job.dayTime, job.weekday, job.cadence):
+            id_hash.update(str(field).encode())
+            id_hash.update(b'\x1f')
+        job.id = id_hash.hexdigest()
+
+        # generate a fingerprint for job, jobs without 
+        # password log in with the default keys or agent
+        if password:
+            job.fingerprint = self.encrypt(self.masterKey, password)
 
         # add job object to jobs list
         self.jobs.append(job)
 
-    def startJob (self, job: dict) -> bool:
+    def dispatchJob (self, job: cron_job) -> bool:
+
+        '''
+        Hands a due job to the work pool without waiting for it, so a 
+        long backup does not hold back other jobs. Returns False if the
+        job is still running from an earlier dispatch.
+        '''
+
+        with self.lock:
+            if job.id in self.running:
+                return False
+            self.running.add(job.id)
+        
+        def release (future) -> None:
+            with self.lock:
+                self.running.discard(job.id)
+            if future.exception():
+                log(f'job {job.origin_path} ---> {job.host}:{job.target_path}:', future.exception(), header='error', verbose=False)
+        
+        self.pool.submit(self.startJob, job).add_done_callback(release)
+
+        return True
+
+    def startJob (self, job: cron_job) -> bool:
 
         '''
         Triggers a backup job.
@@ -641,12 +1799,19 @@ class cron:
 
         cl = client()
 
-        # check if host is remote
-        if job['host'] != 'localhost':
-            cl.ssh(job['user'], job['host'], self.decrypt(self.masterKey, job['fingerprint']), job['sshFilePath'])
+        try:
+
+            # check if host is remote
+            if job.host != 'localhost':
+                password = self.decrypt(self.masterKey, job.fingerprint) if job.fingerprint else None
+                cl.ssh(job.user, job.host, password, job.sshFilePath)
+            
+            # backup
+            return cl.backup(job.origin_path, job.target_path, compress=job.compress, force=job.force)
         
-        # backup
-        cl.backup(job['origin_path'], job['target_path'], job['compress'], job['force'])
+        finally:
+
+            cl.close()
 
     def decrypt (self, key: bytes, ciphertext: str) -> str:
 
@@ -656,8 +1821,7 @@ class cron:
         each encryption operation and prepends it to the ciphertext.
         '''
 
-        cipher = Fernet(key)
-        return cipher.decrypt(str.encode(ciphertext)).decode()
+        return self.get_cipher(key).decrypt(ciphertext.encode()).decode()
 
     def encrypt (self, key: bytes, plaintext: str) -> str:
 
@@ -667,8 +1831,19 @@ class cron:
         each encryption operation and prepends it to the ciphertext.
         '''
 
-        cipher = Fernet(key)
-        return cipher.encrypt(str.encode(plaintext)).decode()
+        return self.get_cipher(key).encrypt(plaintext.encode()).decode()
+    
+    def get_cipher (self, key: bytes) -> Fernet:
+
+        '''
+        Returns the Fernet cipher for provided key, ciphers are 
+        cached since their construction decodes the key.
+        '''
+
+        if key not in self.ciphers:
+            self.ciphers[key] = Fernet(key)
+        
+        return self.ciphers[key]
     
     def keyGen (self, secret:str) -> bytes:
 
@@ -677,9 +1852,10 @@ class cron:
         This method is useful to generate keys from secrets for Fernet module.
         '''
 
-        hash_object = hashlib.sha256(secret.encode())
-        hash_hex = hash_object.hexdigest()
-        hash_base64 = base64.b64encode(bytes.fromhex(hash_hex))
+        # Fernet expects the url-safe alphabet, both decode to the same
+        # 32 bytes, so keys derived before remain valid
+        hash_bytes = hashlib.sha256(secret.encode()).digest()
+        hash_base64 = base64.urlsafe_b64encode(hash_bytes)
 
         return hash_base64
     
@@ -694,7 +1870,7 @@ class cron:
 
                 pass
 
-        except:
+        except Exception:
             print_exc()
         
 
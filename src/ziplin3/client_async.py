@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+
+'''
+Asynchronous ZipLin3 client for remote backups on top of asyncssh.
+All transfers of a backup share a single sftp session, every upload
+keeps many write requests in flight and several uploads run
+concurrently. For local backups or compression use ziplin3.client.
+'''
+
+import os
+import asyncio
+import asyncssh
+from pathlib import PosixPath, PurePosixPath, Path
+from datetime import datetime
+from traceback import print_exc
+
+from .client import log, size_format, progress
+
+class async_client:
+
+    def __init__ (self) -> None:
+
+        # ssh and file sharing
+        self.ssh_enabled = False
+        self.connection = None
+        self.sftp = None
+        self.host = 'localhost'
+
+        # sftp pipelining: bytes per write request
+        # and write requests in flight per upload
+        self.block_size = 131072
+        self.max_requests = 64
+
+        self.bar_full = '█' * 50
+        self.bar_empty = ' ' * 50
+        self.progress = progress()
+
+    async def backup (self, origin_path: str|PosixPath, target_path: str|PosixPath, clean_artifacts: bool=True,
+                      force: bool=False, verbose: bool=True, log_path: PosixPath|str|None=None, workers: int=8) -> bool:
+
+        '''
+        Backups the origin path which points at a file or directory,
+        into target_path, the destination directory on the remote host.
+        Files of equal size and modification time on both hosts are skipped.
+
+        [Parameters]
+        origin_path         path to file or directory as string or posix
+        target_path         destination directory path on remote host,
+                            the path needs to exist
+        clean_artifacts     will clear all artifacts in provided target_path
+                            which are not tracked in corresponding origin_path.
+        force               if enabled will ignorantly copy everything
+        verbose             verbose shell output
+        workers             number of files transferred concurrently
+
+        [Return]
+        True if the backup completed without errors, otherwise False
+        (see the log for the failed files).
+        '''
+
+        if not self.ssh_enabled:
+            raise ValueError('Please enable ssh first with async_client.ssh!')
+
+        start_ts = datetime.now()
+
+        log(f'start backup {origin_path} ---> {self.host}:{target_path}', verbose=False, log_path=log_path)
+
+        success = False
+        try:
+            async with self.connection.start_sftp_client() as self.sftp:
+                success = await self.send(origin_path, target_path, force, clean_artifacts, verbose, log_path, workers)
+        except (asyncssh.Error, OSError) as e:
+            log(f'{origin_path} ---> {self.host}:{target_path}:', e, header='error', verbose=False, log_path=log_path)
+            print_exc()
+        finally:
+            self.sftp = None
+
+        # determine backup time
+        dt = datetime.now() - start_ts
+        copied = size_format(self.progress.copied)
+        completed = size_format(self.progress.completed)
+
+        # output
+        log(f'\n\nBackup time: {str(dt)}', header='info', verbose=verbose, log_path=log_path)
+        log(f'Backup size: {completed[0]} {completed[1]} ', header='info', verbose=verbose, log_path=log_path)
+        log(f'Copied     : {copied[0]} {copied[1].upper()}', header='info', verbose=verbose, log_path=log_path)
+        log(f'Files sent : {self.progress.files_sent}', header='info', verbose=verbose, log_path=log_path)
+        if success:
+            log(header=f'🏁 successfully backed up {Path(origin_path).name}.', verbose=verbose, log_path=log_path)
+        else:
+            log(header=f'backup of {Path(origin_path).name} is incomplete, {self.progress.files_failed} files failed.', verbose=verbose, log_path=log_path)
+
+        # reset progress values
+        self.progress = progress()
+
+        return success
+
+    def format_progress (self) -> str:
+        counters = self.progress
+        share = min(counters.completed / counters.total, 1) if counters.total else 0
+        fulls = int(share * 50)
+        return f'|{self.bar_full[:fulls]}{self.bar_empty[fulls:]}| ({int(share * 100)}%)'
+
+    async def listdir_attr (self, path: PurePosixPath) -> dict:
+
+        '''
+        Lists a remote directory in a single request.
+
+        [Return]
+        A dict {base name: asyncssh.SFTPAttrs} of all nodes in the directory.
+        '''
+
+        return {name.filename: name.attrs for name in await self.sftp.readdir(path.as_posix())
+                if name.filename not in ('.', '..')}
+
+    async def send (self, origin_path: str|PosixPath, target_path: str|PosixPath, force: bool=False,
+                    clean_artifacts: bool=True, verbose: bool=True, log_path: PosixPath|str|None=None,
+                    workers: int=8) -> bool:
+
+        '''
+        Sends a file or whole directory at origin into a directory at target_path
+        on the remote host. The tree is walked first, then all pending uploads
+        are gathered with at most workers uploads at a time.
+        Returns True if no file failed to transfer.
+
+        [Parameter]
+        origin_path:        path to file or directory as string or posix
+        target_path:        destination directory path as string or posix
+        force               if enabled will always send the file
+        clean_artifact      if enabled will remove all files in target which are not
+                            tracked in origin
+        verbose             if enabled will log process in shell
+        workers             number of files transferred concurrently
+        '''
+
+        origin_path = Path(origin_path)
+        target_path = PurePosixPath(target_path)
+
+        # collect (origin file, target file, size, target attributes)
+        uploads = []
+
+        if origin_path.is_file():
+
+            target_attrs = await self.listdir_attr(target_path)
+            uploads.append((origin_path, target_path.joinpath(origin_path.name),
+                            origin_path.stat().st_size, target_attrs.get(origin_path.name)))
+
+        # traverse the origin tree top-down with an explicit stack of
+        # (origin directory, target parent directory, parent listing)
+        stack = [(origin_path, target_path, None)] if origin_path.is_dir() else []
+        while stack:
+
+            origin_dir, target_parent, parent_attrs = stack.pop()
+
+            # create missing target directories, sub directories
+            # are looked up in the listing of their parent
+            target_dir = target_parent.joinpath(origin_dir.name)
+            if parent_attrs is None:
+                exists = await self.sftp.exists(target_dir.as_posix())
+            else:
+                exists = origin_dir.name in parent_attrs
+            if exists:
+                target_attrs = await self.listdir_attr(target_dir)
+            else:
+                await self.sftp.mkdir(target_dir.as_posix())
+                target_attrs = {}
+
+            names = set()
+            with os.scandir(origin_dir) as entries:
+                for entry in entries:
+                    names.add(entry.name)
+                    if entry.is_dir():
+                        stack.append((origin_dir.joinpath(entry.name), target_dir, target_attrs))
+                    else:
+                        uploads.append((Path(entry.path), target_dir.joinpath(entry.name),
+                                        entry.stat().st_size, target_attrs.get(entry.name)))
+
+            # cleaning
+            if clean_artifacts:
+                for name in target_attrs.keys() - names:
+                    await self.clean_artifact(target_dir.joinpath(name), verbose, log_path)
+
+        self.progress.total = sum(upload[2] for upload in uploads)
+
+        # bound the concurrent uploads
+        semaphore = asyncio.Semaphore(workers)
+        async def bounded_send_file (*upload) -> None:
+            async with semaphore:
+                await self.send_file(*upload, force=force, verbose=verbose, log_path=log_path)
+
+        await asyncio.gather(*[bounded_send_file(*upload) for upload in uploads])
+
+        return not self.progress.files_failed
+
+    async def send_file (self, origin_path: PosixPath, target_path: PurePosixPath, size: int,
+                         target_stat: asyncssh.SFTPAttrs|None, force: bool=False, verbose: bool=True,
+                         log_path: PosixPath|str|None=None) -> None:
+
+        '''
+        Uploads a single file to target_path (including the file name) unless the
+        listed target_stat matches size and modification time of the origin.
+        '''
+
+        self.progress.completed += size
+
+        if not force and target_stat and target_stat.size == size and \
+           int(target_stat.mtime) == int(origin_path.stat().st_mtime):
+            log(f'{target_path} is already up-to-date with origin.', header=self.format_progress(), verbose=verbose, log_path=log_path, end='\r')
+            return
+
+        try:
+
+            log(f'{origin_path}', header=self.format_progress(), verbose=verbose, end='\r')
+
+            # preserve keeps the modification time for the quick-check
+            await self.sftp.put(str(origin_path), target_path.as_posix(), preserve=True,
+                                block_size=self.block_size, max_requests=self.max_requests)
+            log(f'{origin_path} ---> {self.host}:{target_path}', verbose=False, log_path=log_path)
+
+            # denote the copied size
+            self.progress.copied += size
+            self.progress.files_sent += 1
+
+        except Exception as e:
+
+            log(f'{origin_path} ---> {self.host}:{target_path}:', str(e), header='error', verbose=False, log_path=log_path)
+            self.progress.files_failed += 1
+
+    async def clean_artifact (self, node: PurePosixPath, verbose: bool=True, log_path: PosixPath|str|None=None) -> None:
+
+        '''
+        Removes a remote file or directory tree which is not tracked in origin.
+        Failures are logged, the backup continues.
+        '''
+
+        log(f'clean artifact: {node.as_posix()}', verbose=verbose, log_path=log_path, end='\r')
+
+        try:
+            if await self.sftp.isdir(node.as_posix()):
+                await self.sftp.rmtree(node.as_posix())
+            else:
+                await self.sftp.remove(node.as_posix())
+        except asyncssh.SFTPError as e:
+            log(f'clean artifact {self.host}:{node.as_posix()}:', e, header='error', verbose=False, log_path=log_path)
+
+    async def ssh (self, user: str, host: str, password: str|None=None, ssh_path: str|PosixPath|None=None, port: int=22) -> None:
+
+        '''
+        Connects to host via ssh.
+        This method takes a password or path to ssh file to derve login credentials,
+        if neither is provided the default keys in ~/.ssh and the ssh agent are used.
+
+        ssh_path:    OpenSSH file format
+        '''
+
+        self.user = user
+        self.host = host
+        self.port = port
+
+        # host keys are accepted like with paramiko.AutoAddPolicy,
+        # without client_keys the default keys and agent are tried
+        self.connection = await asyncssh.connect(self.host, port=self.port, username=self.user, password=password,
+                                                 client_keys=[str(ssh_path)] if ssh_path else None, known_hosts=None)
+
+        # flip the ssh flag
+        self.ssh_enabled = True
+
+    def close (self) -> None:
+
+        '''
+        Closes the ssh connection.
+        '''
+
+        if self.connection:
+            self.connection.close()
+        self.connection = None
+        self.ssh_enabled = False